@@ -0,0 +1,85 @@
+"""
+Converts the rune detection model into a TensorRT-optimized SavedModel for the GPU,
+or into an INT8-quantized TFLite model for the CPU. TF-TRT is only included in Linux
+builds of TensorFlow, so the TensorRT model must be built and run on Linux.
+
+The model keeps its NHWC layout: its serving signature takes NHWC uint8 images, and
+TensorRT already picks the fastest layout for each layer when it builds the engines.
+"""
+
+import os
+import cv2
+import argparse
+import numpy as np
+import tensorflow as tf
+from src.common import utils
+
+
+MODEL_DIR = 'assets/models/rune_model_rnn_filtered_cannied/saved_model'
+TRT_MODEL_DIR = 'assets/models/rune_model_rnn_filtered_cannied/saved_model_trt'
+TFLITE_MODEL_PATH = 'assets/models/rune_model_rnn_filtered_cannied/model_int8.tflite'
+
+# The input shapes main.py feeds the model: the scaled-down crop of its 1366x768 frames,
+# then the padded rune box and its rotation
+INPUT_SHAPES = [utils.stage_one_shape(768, 1366), (1, 384, 455, 3), (1, 455, 384, 3)]
+
+
+def convert_to_trt(precision):
+    """Converts the model with TF-TRT and pre-builds an engine for each input shape"""
+    from tensorflow.python.compiler.tensorrt import trt_convert as trt     # Linux only
+    print(f'\n[~] Converting rune model to TensorRT at {precision}:')
+    converter = trt.TrtGraphConverterV2(
+        input_saved_model_dir=MODEL_DIR,
+        precision_mode=precision,
+        maximum_cached_engines=len(INPUT_SHAPES)
+    )
+    converter.convert()
+
+    def input_fn():
+        for shape in INPUT_SHAPES:
+            yield (np.zeros(shape, np.uint8),)
+
+    converter.build(input_fn=input_fn)
+    print(f' -  Built engines for input shapes {INPUT_SHAPES}')
+    converter.save(TRT_MODEL_DIR)
+    print(f" ~  Saved TensorRT model to '{TRT_MODEL_DIR}'")
+
+
+def representative_dataset(calibration_dir):
+    """Yields each preprocessed calibration frame in CALIBRATION_DIR as a single-image batch"""
+    for name in sorted(os.listdir(calibration_dir)):
+        image = cv2.imread(os.path.join(calibration_dir, name))
+        if image is not None:
+            yield [image[np.newaxis]]
+
+
+def convert_to_tflite(calibration_dir):
+    """Quantizes the model to INT8, calibrating activations on the frames in CALIBRATION_DIR"""
+    print(f"\n[~] Quantizing rune model to INT8 using frames in '{calibration_dir}':")
+    converter = tf.lite.TFLiteConverter.from_saved_model(MODEL_DIR)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = lambda: representative_dataset(calibration_dir)
+
+    # Detection post-processing has no INT8 builtin, so let those ops fall back to TensorFlow
+    converter.target_spec.supported_ops = [
+        tf.lite.OpsSet.TFLITE_BUILTINS_INT8,
+        tf.lite.OpsSet.SELECT_TF_OPS
+    ]
+    with open(TFLITE_MODEL_PATH, 'wb') as file:
+        file.write(converter.convert())
+    print(f" ~  Saved TFLite model to '{TFLITE_MODEL_PATH}'")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--precision', default='FP16', choices=['FP32', 'FP16'])
+    parser.add_argument('--tflite', metavar='CALIBRATION_DIR',
+                        help='quantize to INT8 TFLite instead, calibrating on the model '
+                             'inputs saved in CALIBRATION_DIR by "python main.py --dump '
+                             'CALIBRATION_DIR" while solving a few runes')
+    args = parser.parse_args()
+
+    if args.tflite:
+        convert_to_tflite(args.tflite)
+    else:
+        convert_to_trt(args.precision)
@@ -1,50 +1,222 @@
 """The central program that ties all the modules together."""
 
+import os
+import time
+import queue
+import argparse
+import itertools
+import threading
 import tensorflow as tf
 import numpy as np
+import numba
 import cv2
-import win32pipe, win32file
+import win32pipe, win32file, win32event, winerror, pywintypes
 from src.common import config, utils
 import mss
 
+
+# Arrow directions indexed by the model's class IDs
+LABELS = (None, 'up', 'down', 'left', 'right')
+
+# What vertical arrows in the rotated image really are, indexed by class ID
+ROTATED_LABELS = (None, 'right', 'left', None, None)
+
+# Milliseconds to wait for a client between heartbeat inferences
+HEARTBEAT_INTERVAL = 200
+
+# OpenCV converts 8-bit BGR to HSV in 12-bit fixed point, dividing through these tables
+HSV_SHIFT = 12
+SDIV_TABLE = np.array([0] + [round((255 << HSV_SHIFT) / i) for i in range(1, 256)], np.int64)
+HDIV_TABLE = np.array([0] + [round((180 << HSV_SHIFT) / (6 * i)) for i in range(1, 256)],
+                      np.int64)
+
+# Size of the canvas the rune box is padded onto, which the model was trained on
+PAD_HEIGHT, PAD_WIDTH = 384, 455
+
+# A blank batch large enough to be sliced into any stage's input, used to warm the model up
+BLANK_BATCH = np.zeros((1, PAD_WIDTH, PAD_WIDTH, 3), np.uint8)
+
+# Directory that every image fed to the model is saved into, if set with --dump
+dump_dir = None
+
+# The rune box's edges padded onto the canvas, before being expanded into UPRIGHT
+PADDED_EDGES = np.zeros((PAD_HEIGHT, PAD_WIDTH), np.uint8)
+
+# The second stage's inputs: the padded rune box and its rotation. Their shapes differ, so
+# each is its own single-image batch, written in place every frame.
+UPRIGHT = np.zeros((1, PAD_HEIGHT, PAD_WIDTH, 3), np.uint8)
+ROTATED = np.zeros((1, PAD_WIDTH, PAD_HEIGHT, 3), np.uint8)
+
+
+class TFLiteModel():
+    """Runs a quantized TFLite model through the same interface as the traced SavedModel."""
+
+    def __init__(self, model_path):
+        self.model_path = model_path
+
+        # One interpreter per input shape, so none of them is ever resized and re-allocated
+        self.runners = {}
+
+    def __call__(self, input_tensor):
+        input_tensor = np.asarray(input_tensor)
+        runner = self.runners.get(input_tensor.shape)
+        if runner is None:
+            # The interpreter delegates supported INT8 kernels to XNNPACK by default
+            interpreter = tf.lite.Interpreter(model_path=self.model_path,
+                                              num_threads=os.cpu_count())
+            runner = interpreter.get_signature_runner('serving_default')
+            self.runners[input_tensor.shape] = runner
+        return runner(input_tensor=input_tensor)
+
+
+def load_saved_model(model_dir):
+    """
+    Loads a SavedModel and wraps its serving signature in a traced function.
+    :param model_dir:   The directory of the SavedModel to load.
+    :return:            A callable that runs the model on a batch of uint8 images.
+    """
+
+    saved_model = tf.saved_model.load(model_dir)
+    serving_fn = saved_model.signatures['serving_default']
+
+    # Trace against the signature's own input spec. Exported detection models usually pin
+    # the batch dimension to 1, which every stage's single-image batch satisfies, while the
+    # open spatial dimensions let the cropped frame and the rune boxes share a single trace.
+    input_spec = tf.nest.flatten(serving_fn.structured_input_signature)[0]
+
+    @tf.function(input_signature=[input_spec])
+    def infer(input_tensor):
+        return serving_fn(input_tensor)
+
+    # Trace and compile the function once before the first real frame arrives
+    infer(UPRIGHT)
+    return infer
+
+
 def load_model():
     """
-    Loads the saved model's weights into an Tensorflow model.
-    :return:    The Tensorflow model object.
+    Loads the rune detection model. Prefers the TensorRT model built by convert_model.py
+    when a GPU is available, then its INT8 TFLite model if one has been built, and
+    otherwise the original SavedModel.
+    :return:    A callable that runs the model on a batch of uint8 images.
     """
 
-    model_dir = f'assets/models/rune_model_rnn_filtered_cannied/saved_model'
-    return tf.saved_model.load(model_dir)
+    model_dir = 'assets/models/rune_model_rnn_filtered_cannied/saved_model'
+    trt_model_dir = f'{model_dir}_trt'
+    tflite_model_path = 'assets/models/rune_model_rnn_filtered_cannied/model_int8.tflite'
+    if tf.config.list_physical_devices('GPU') and os.path.isdir(trt_model_dir):
+        # TF-TRT only ships with Linux builds of TensorFlow, so elsewhere the model's
+        # TensorRT ops cannot be loaded or run
+        try:
+            return load_saved_model(trt_model_dir)
+        except Exception as e:
+            print(f"Could not load the TensorRT model, falling back: {e}")
+    if os.path.isfile(tflite_model_path):
+        tflite_model = TFLiteModel(tflite_model_path)
+        tflite_model(UPRIGHT)
+        return tflite_model
+    return load_saved_model(model_dir)
 
 
 def canny(image):
     """
     Performs Canny edge detection on IMAGE.
-    :param image:   The input image as a Numpy array.
-    :return:        The edges in IMAGE.
+    :param image:   The input image as a Numpy array or UMat.
+    :return:        The edges in IMAGE as a single-channel Numpy array.
     """
 
-    image = cv2.Canny(image, 200, 300)
-    colored = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
-    return colored
+    edges = cv2.Canny(image, 200, 300)
+    if isinstance(edges, cv2.UMat):
+        edges = edges.get()
+    return edges
+
+
+@numba.njit(parallel=True, cache=True)
+def hsv_mask(image, lower, upper, out):
+    """
+    Thresholds IMAGE on OpenCV's 8-bit HSV scale without materializing the HSV image.
+    :param image:   The input image in BGR or BGRA.
+    :param lower:   The inclusive lower (H, S, V) bound.
+    :param upper:   The inclusive upper (H, S, V) bound.
+    :param out:     The single-channel array to write the mask into.
+    :return:        None
+    """
+
+    # Mirrors cv2.cvtColor(image, cv2.COLOR_BGR2HSV) exactly, rounding included
+    half = 1 << (HSV_SHIFT - 1)
+    for i in numba.prange(image.shape[0]):
+        for j in range(image.shape[1]):
+            b, g, r = int(image[i, j, 0]), int(image[i, j, 1]), int(image[i, j, 2])
+            v = max(b, g, r)
+            diff = v - min(b, g, r)
+            s = (diff * SDIV_TABLE[v] + half) >> HSV_SHIFT
+            if v == r:
+                h = g - b
+            elif v == g:
+                h = b - r + 2 * diff
+            else:
+                h = r - g + 4 * diff
+            h = (h * HDIV_TABLE[diff] + half) >> HSV_SHIFT
+            if h < 0:
+                h += 180
+            if lower[0] <= h <= upper[0] and lower[1] <= s <= upper[1] and lower[2] <= v <= upper[2]:
+                out[i, j] = 255
+            else:
+                out[i, j] = 0
 
 
 def filter_color(image):
     """
-    Filters out all colors not between orange and green on the HSV scale, which
-    eliminates some noise around the arrows.
-    :param image:   The input image.
-    :return:        The color-filtered image.
+    Finds all colors between orange and green on the HSV scale, which can be used
+    to eliminate some noise around the arrows.
+    :param image:   The input image in BGR or BGRA, as a Numpy array.
+    :return:        A mask of the pixels within that color range.
+    """
+
+    mask = np.empty(image.shape[:2], np.uint8)
+    hsv_mask(image, (1, 100, 100), (75, 255, 255), mask)
+    return mask
+
+
+def preprocess(image):
+    """
+    Filters IMAGE down to the arrows' colors and performs Canny edge detection on it.
+    :param image:   The input image in BGRA, as a Numpy array.
+    :return:        The edges in IMAGE as a single-channel Numpy array.
+    """
+
+    mask = filter_color(image)
+
+    # Upload the image and its mask once so that OpenCL can run the remaining steps.
+    # Canny only needs intensity, so the image goes straight from BGRA to grayscale.
+    gray = cv2.cvtColor(cv2.UMat(image), cv2.COLOR_BGRA2GRAY)
+    filtered = cv2.bitwise_and(gray, gray, mask=cv2.UMat(mask))
+    return canny(filtered)
+
+
+def run_inference_for_batch(model, batch):
+    """
+    Performs a single inference on a batch of images.
+    :param model:   The model function returned by load_model.
+    :param batch:   The input images stacked into a single Numpy array.
+    :return:        A list of the model's predictions for each image in BATCH.
     """
 
-    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-    mask = cv2.inRange(hsv, (1, 100, 100), (75, 255, 255))
+    # Converting BATCH to a tensor is left to the model, which copies a contiguous BATCH once
+    output_dict = model(batch)
+    if dump_dir:
+        for i, image in enumerate(batch):
+            cv2.imwrite(os.path.join(dump_dir, f'{time.time_ns()}_{i}.png'), image)
 
-    # Mask the image
-    color_mask = mask > 0
-    arrows = np.zeros_like(image, np.uint8)
-    arrows[color_mask] = image[color_mask]
-    return arrows
+    num_detections = np.asarray(output_dict.pop('num_detections')).astype(np.int64)
+    output_dict = {key: np.asarray(value) for key, value in output_dict.items()}
+    results = []
+    for i, n in enumerate(num_detections):
+        result = {key: value[i,:n] for key, value in output_dict.items()}
+        result['num_detections'] = int(n)
+        result['detection_classes'] = result['detection_classes'].astype(np.int64)
+        results.append(result)
+    return results
 
 
 def run_inference_for_single_image(model, image):
@@ -55,38 +227,32 @@ def run_inference_for_single_image(model, image):
     :return:        The model's predictions including bounding boxes and classes.
     """
 
-    image = np.asarray(image)
+    return run_inference_for_batch(model, image[np.newaxis])[0]
 
-    input_tensor = tf.convert_to_tensor(image)
-    input_tensor = input_tensor[tf.newaxis,...]
 
-    model_fn = model.signatures['serving_default']
-    output_dict = model_fn(input_tensor)
+def top_indices(output_dict):
+    """
+    Finds the best four classifications out of a single image's predictions.
+    :param output_dict:     The model's predictions for one image.
+    :return:                The indices of the top four predictions, most confident first.
+    """
 
-    num_detections = int(output_dict.pop('num_detections'))
-    output_dict = {key: value[0,:num_detections].numpy()
-                   for key, value in output_dict.items()}
-    output_dict['num_detections'] = num_detections
-    output_dict['detection_classes'] = output_dict['detection_classes'].astype(np.int64)
-    return output_dict
+    scores = output_dict['detection_scores']
+    keep = np.flatnonzero(scores > 0.5)
+    return keep[np.argsort(-scores[keep], kind='stable')][:4]
 
 
-def sort_by_confidence(model, image):
+def top_detections(output_dict):
     """
-    Runs a single inference on the image and returns the best four classifications.
-    :param model:   The model object to use.
-    :param image:   The input image.
-    :return:        The model's top four predictions.
+    Returns the best four classifications out of a single image's predictions.
+    :param output_dict:     The model's predictions for one image.
+    :return:                The top four predictions as (score, box, class) tuples.
     """
 
-    output_dict = run_inference_for_single_image(model, image)
-    zipped = list(zip(output_dict['detection_scores'],
-                      output_dict['detection_boxes'],
-                      output_dict['detection_classes']))
-    pruned = [t for t in zipped if t[0] > 0.5]
-    pruned.sort(key=lambda x: x[0], reverse=True)
-    result = pruned[:4]
-    return result
+    order = top_indices(output_dict)
+    return list(zip(output_dict['detection_scores'][order],
+                    output_dict['detection_boxes'][order],
+                    output_dict['detection_classes'][order]))
 
 
 def get_boxes(model, image):
@@ -94,18 +260,11 @@ def get_boxes(model, image):
     Returns the bounding boxes of the top four classified arrows.
     :param model:   The model object to predict with.
     :param image:   The input image.
-    :return:        Up to four bounding boxes.
+    :return:        Up to four bounding boxes as rows of a Numpy array.
     """
 
     output_dict = run_inference_for_single_image(model, image)
-    zipped = list(zip(output_dict['detection_scores'],
-                      output_dict['detection_boxes'],
-                      output_dict['detection_classes']))
-    pruned = [t for t in zipped if t[0] > 0.5]
-    pruned.sort(key=lambda x: x[0], reverse=True)
-    pruned = pruned[:4]
-    boxes = [t[1:] for t in pruned]
-    return boxes
+    return output_dict['detection_boxes'][top_indices(output_dict)]
 
 @utils.run_if_enabled
 def merge_detection(model, image):
@@ -118,52 +277,56 @@ def merge_detection(model, image):
     :return:        A list of four arrow directions.
     """
 
-    label_map = {1: 'up', 2: 'down', 3: 'left', 4: 'right'}
-    converter = {'up': 'right', 'down': 'left'}         # For the 'rotated inferences'
     classes = []
 
-    # Preprocessing
+    # Locate the rune box within a downscaled copy of the cropped frame
     height, width, channels = image.shape
-    cropped = image[120:height//2, width//4:3*width//4]
-    filtered = filter_color(cropped)
-    cannied = canny(filtered)
-
-    # Isolate the rune box
-    height, width, channels = cannied.shape
-    boxes = get_boxes(model, cannied)
+    top, bottom, left, right = utils.rune_search_bounds(height, width)
+    cropped = image[top:bottom, left:right]
+    _, small_height, small_width, _ = utils.stage_one_shape(height, width)
+    small = cv2.resize(cropped, (small_width, small_height), interpolation=cv2.INTER_AREA)
+    boxes = get_boxes(model, cv2.cvtColor(preprocess(small), cv2.COLOR_GRAY2BGR))
     if len(boxes) == 4:      # Only run further inferences if arrows have been correctly detected
-        y_mins = [b[0][0] for b in boxes]
-        x_mins = [b[0][1] for b in boxes]
-        y_maxes = [b[0][2] for b in boxes]
-        x_maxes = [b[0][3] for b in boxes]
-        left = int(round(min(x_mins) * width))
-        right = int(round(max(x_maxes) * width))
-        top = int(round(min(y_mins) * height))
-        bottom = int(round(max(y_maxes) * height))
-        rune_box = cannied[top:bottom, left:right]
+        # The boxes are normalized, so they map directly onto the full-resolution crop
+        height, width, channels = cropped.shape
+        y_min, x_min, _, _ = boxes.min(axis=0)
+        _, _, y_max, x_max = boxes.max(axis=0)
+        left = int(round(x_min * width))
+        right = int(round(x_max * width))
+        top = int(round(y_min * height))
+        bottom = int(round(y_max * height))
+        region = cropped[top:bottom, left:right]
 
         # Pad the rune box with black borders, effectively eliminating the noise around it
-        height, width, channels = rune_box.shape
-        pad_height, pad_width = 384, 455
-        preprocessed = np.full((pad_height, pad_width, channels), (0, 0, 0), dtype=np.uint8)
-        x_offset = (pad_width - width) // 2
-        y_offset = (pad_height - height) // 2
-
-        if x_offset > 0 and y_offset > 0:
-            preprocessed[y_offset:y_offset+height, x_offset:x_offset+width] = rune_box
+        height, width, channels = region.shape
+        x_offset = (PAD_WIDTH - width) // 2
+        y_offset = (PAD_HEIGHT - height) // 2
+
+        # An empty or oversized rune box leaves the canvas black
+        if height > 0 and width > 0 and x_offset > 0 and y_offset > 0:
+            rune_box = preprocess(region)
+
+            # Pad the single-channel edges in one pass, then expand them into the batch
+            cv2.copyMakeBorder(rune_box,
+                               y_offset, PAD_HEIGHT - y_offset - height,
+                               x_offset, PAD_WIDTH - x_offset - width,
+                               cv2.BORDER_CONSTANT, dst=PADDED_EDGES, value=0)
+            cv2.cvtColor(PADDED_EDGES, cv2.COLOR_GRAY2BGR, dst=UPRIGHT[0])
+        else:
+            UPRIGHT[0].fill(0)
 
         # Run detection on preprocessed image
-        lst = sort_by_confidence(model, preprocessed)
+        upright_output = run_inference_for_batch(model, UPRIGHT)[0]
+        lst = top_detections(upright_output)
         lst.sort(key=lambda x: x[1][1])
-        classes = [label_map[item[2]] for item in lst]
+        classes = [LABELS[c] for _, _, c in lst]
 
         # Run detection on rotated image
-        rotated = cv2.rotate(preprocessed, cv2.ROTATE_90_COUNTERCLOCKWISE)
-        lst = sort_by_confidence(model, rotated)
+        cv2.rotate(UPRIGHT[0], cv2.ROTATE_90_COUNTERCLOCKWISE, dst=ROTATED[0])
+        rotated_output = run_inference_for_batch(model, ROTATED)[0]
+        lst = top_detections(rotated_output)
         lst.sort(key=lambda x: x[1][2], reverse=True)
-        rotated_classes = [converter[label_map[item[2]]]
-                           for item in lst
-                           if item[2] in [1, 2]]
+        rotated_classes = [ROTATED_LABELS[c] for _, _, c in lst if c in (1, 2)]
 
         # Merge the two detection results
         for i in range(len(classes)):
@@ -173,70 +336,206 @@ def merge_detection(model, image):
     return classes
 
 
+def heartbeat(model, batch):
+    """
+    Runs the model on a blank batch so that TensorFlow's runtime never goes idle between
+    detections. TFLite has no such pauses, so its interpreters are left alone.
+    :param model:   The model function returned by load_model.
+    :param batch:   A blank batch shaped like one of the model's inputs.
+    :return:        None
+    """
+
+    if not isinstance(model, TFLiteModel):
+        model(batch)
+
+
+def grab_frame(sct, monitor):
+    """
+    Takes a screenshot and views it in place instead of copying it out of mss's buffer.
+    :param sct:         The mss instance to capture with.
+    :param monitor:     The region of the screen to capture.
+    :return:            The screenshot as a BGRA Numpy array.
+    """
+
+    sshot = sct.grab(monitor)
+    return np.frombuffer(sshot.raw, np.uint8).reshape(sshot.height, sshot.width, 4)
+
+
+class FrameGrabber():
+    """
+    Captures the screen on a background thread so that capture overlaps inference. Capture
+    only runs between calls to resume() and pause(), so the thread idles between clients.
+    """
+
+    def __init__(self, monitor):
+        self.monitor = monitor
+        self.frames = queue.Queue(maxsize=2)
+        self.active = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._main)
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+
+    def resume(self):
+        """Starts capturing frames."""
+
+        self.active.set()
+
+    def pause(self):
+        """Stops capturing frames and discards any that are still queued."""
+
+        with self.lock:
+            self.active.clear()
+        while True:
+            try:
+                self.frames.get_nowait()
+            except queue.Empty:
+                return
+
+    def _main(self):
+        # mss keeps its capture handles per thread, so the instance must be created here
+        with mss.mss() as sct:
+            while True:
+                self.active.wait()
+                try:
+                    frame = grab_frame(sct, self.monitor)
+                except mss.exception.ScreenShotError as e:
+                    frame = e       # Queued in place of a frame and raised by latest()
+                with self.lock:
+                    if not self.active.is_set():        # Paused while grabbing, drop the frame
+                        continue
+                    if self.frames.full():
+                        try:
+                            self.frames.get_nowait()
+                        except queue.Empty:
+                            pass
+                    self.frames.put(frame)
+
+    def latest(self):
+        """
+        Waits for a frame if none is queued, then returns the newest one and drops the rest.
+        Must only be called while capture is resumed.
+        :return:    The newest frame, unless capturing it raised a ScreenShotError.
+        """
+
+        frame = self.frames.get()
+        while True:
+            try:
+                frame = self.frames.get_nowait()
+            except queue.Empty:
+                break
+        if isinstance(frame, Exception):
+            raise frame
+        return frame
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--dump', metavar='DIR',
+                    help='save every image fed to the model into DIR, e.g. to collect '
+                         'calibration frames for convert_model.py --tflite')
+args = parser.parse_args()
+if args.dump:
+    os.makedirs(args.dump, exist_ok=True)
+    dump_dir = args.dump
+
 config.enabled = True
 monitor = {'top': 0, 'left': 0, 'width': 1366, 'height': 768}
+
+# Cycle the heartbeat through every input shape the model sees, so that none goes cold
+_, crop_height, crop_width, _ = utils.stage_one_shape(monitor['height'], monitor['width'])
+heartbeat_batches = itertools.cycle((BLANK_BATCH[:, :crop_height, :crop_width],
+                                     BLANK_BATCH[:, :PAD_HEIGHT, :PAD_WIDTH],
+                                     BLANK_BATCH[:, :PAD_WIDTH, :PAD_HEIGHT]))
 model = load_model()
+capture = FrameGrabber(monitor)
+capture.start()
 
 class PipeServer():
     def __init__(self, pipeName):
         self.pipe = win32pipe.CreateNamedPipe(
             r'\\.\pipe\\'+pipeName,
-            win32pipe.PIPE_ACCESS_OUTBOUND,
+            win32pipe.PIPE_ACCESS_OUTBOUND | win32file.FILE_FLAG_OVERLAPPED,
             win32pipe.PIPE_TYPE_MESSAGE | win32pipe.PIPE_READMODE_MESSAGE | win32pipe.PIPE_WAIT,
             1, 65536, 65536,
             0,
             None)
+        self.overlapped = pywintypes.OVERLAPPED()
+        self.overlapped.hEvent = win32event.CreateEvent(None, True, False, None)
 
-    #Carefull, this blocks until a connection is established
+    #Starts listening without blocking, use wait() to find out when a client has connected
     def connect(self):
-        win32pipe.ConnectNamedPipe(self.pipe, None)
+        result = win32pipe.ConnectNamedPipe(self.pipe, self.overlapped)
+        if result == winerror.ERROR_PIPE_CONNECTED:
+            win32event.SetEvent(self.overlapped.hEvent)
+
+    #Waits up to TIMEOUT milliseconds and returns whether a client has connected
+    def wait(self, timeout):
+        result = win32event.WaitForSingleObject(self.overlapped.hEvent, timeout)
+        return result == win32event.WAIT_OBJECT_0
 
     #Message without tailing '\n'
     def write(self, message):
-        win32file.WriteFile(self.pipe, message.encode()+b'\n')
+        win32file.WriteFile(self.pipe, message.encode()+b'\n', self.overlapped)
+        win32file.GetOverlappedResult(self.pipe, self.overlapped, True)
 
     def close(self):
+        win32file.CloseHandle(self.overlapped.hEvent)
         win32file.CloseHandle(self.pipe)
 
 """ ENTRY POINT """
 
 # Run detection once to load models beforehand
 print("Running detection pre-stage")
-with mss.mss() as sct:
-    frame = np.array(sct.grab(monitor))
-    arrows = merge_detection(model, frame)
+capture.resume()
+frame = capture.latest()
+arrows = merge_detection(model, frame)
+capture.pause()
 
 print(f"Detected [{len(arrows)}] arrows:", )
 
 # Main loop (server via named pipe)
 while True:
-    # Blocks logic
     print("Listening for incoming connection")
     t = PipeServer("RuneSolverServer")
     t.connect()
 
+    # Keep the model warm until a client connects
+    while not t.wait(HEARTBEAT_INTERVAL):
+        heartbeat(model, next(heartbeat_batches))
+    capture.resume()
+
     arrows = []
 
     current_attempts = 0
     max_attempts = 100
 
+    # Seconds to wait after a failed detection, growing until it reaches max_backoff
+    backoff = 0.01
+    max_backoff = 0.1
+
     while True:
-        with mss.mss() as sct:
-            frame = np.array(sct.grab(monitor))
+        try:
+            frame = capture.latest()
             arrows = merge_detection(model, frame)
-
-            print(f"Detected [{len(arrows)}] arrows:", )
-            print(arrows)
-
-            if(len(arrows) == 4):
-                break
-            elif(current_attempts < max_attempts):
-                print(f"Retrying. Attempt {current_attempts} / {max_attempts}:")
-                current_attempts += 1
-            else:
-                print(f"Max attempts reached: {current_attempts} / {max_attempts}:")
-                break
-            # time.sleep(0.01)
+        except mss.exception.ScreenShotError as e:
+            print(f"Screenshot failed: {e}")
+            arrows = []
+
+        print(f"Detected [{len(arrows)}] arrows:", )
+        print(arrows)
+
+        if(len(arrows) == 4):
+            break
+        elif(current_attempts < max_attempts):
+            print(f"Retrying. Attempt {current_attempts} / {max_attempts}:")
+            current_attempts += 1
+        else:
+            print(f"Max attempts reached: {current_attempts} / {max_attempts}:")
+            break
+        time.sleep(backoff)
+        backoff = min(backoff * 1.5, max_backoff)
 
     # Handle results
     communication_string = ""
@@ -251,5 +550,6 @@ while True:
     t.write(communication_string)
     t.write("Closing connection")
     t.close()
+    capture.pause()
 
 
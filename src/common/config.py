@@ -6,6 +6,9 @@
 #########################
 RESOURCES_DIR = 'resources'
 
+# Scale of the cropped frame in which the rune solver first searches for the rune box
+RUNE_SEARCH_SCALE = 0.5
+
 
 #################################
 #       Global Variables        #
@@ -223,6 +223,31 @@ def rand_float(start, end):
     return (end - start) * random() + start
 
 
+def rune_search_bounds(height, width):
+    """
+    Returns the region of a frame in which the rune solver searches for the rune box.
+    :param height:  The height of the frame.
+    :param width:   The width of the frame.
+    :return:        The region's (top, bottom, left, right) bounds.
+    """
+
+    return 120, height // 2, width // 4, 3 * width // 4
+
+
+def stage_one_shape(height, width):
+    """
+    Returns the shape of the rune solver's first model input for frames of the given size,
+    which is the search region scaled down by RUNE_SEARCH_SCALE.
+    :param height:  The height of the frame.
+    :param width:   The width of the frame.
+    :return:        The input's (batch, height, width, channels) shape.
+    """
+
+    top, bottom, left, right = rune_search_bounds(height, width)
+    scale = config.RUNE_SEARCH_SCALE
+    return 1, round((bottom - top) * scale), round((right - left) * scale), 3
+
+
 ##########################
 #       Threading        #
 ##########################
@@ -43,10 +43,7 @@ def filter_color(image):
     mask = cv2.inRange(hsv, (1, 100, 100), (75, 255, 255))
 
     # Mask the image
-    color_mask = mask > 0
-    arrows = np.zeros_like(image, np.uint8)
-    arrows[color_mask] = image[color_mask]
-    return arrows
+    return cv2.bitwise_and(image, image, mask=mask)
 
 
 def run_inference_for_single_image(model, image):